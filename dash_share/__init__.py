@@ -1 +1,2 @@
-from .share import update_component_state, DashShare, FileShare, AppLayout
\ No newline at end of file
+from .modify import update_component_state
+from .share import DashShare, FileShare, AppLayout
@@ -0,0 +1,140 @@
+"""
+Helpers for updating component props in a serialized Dash layout.
+
+This module only depends on the standard library and is fully annotated so it
+can be compiled with mypyc (`mypyc dash_share/modify.py`). When the compiled
+extension sits next to this file, Python imports it instead of the source.
+"""
+
+from typing import AbstractSet, Any, Final
+
+Layout = list[dict[str, Any]] | dict[str, Any]
+
+# Marks a lookup miss in `_update_component_state`. Only ever compared by identity;
+# typed as a dict so the hit branch type checks (and compiles) as a patch.
+_MISSING: Final[dict[str, Any]] = {}
+
+
+def update_component_state(
+    layout: Any,
+    updated: None | list[dict[str, Any]] = None,
+    **kwargs: dict[str, Any],
+) -> Any:
+    """
+    Updates values in a Dash app layout in place.
+
+    The layout is walked iteratively with an explicit stack rather than by
+    recursion, so deeply nested layouts can't hit the interpreter's recursion limit.
+
+    Args:
+        layout (Layout): The Dash app layout to be updated. Anything else (e.g.
+            `None` or a string) is returned unchanged.
+        updated (Optional[list[dict[str, Any]]]): Unused. Kept for backwards
+            compatibility with existing callers.
+        **kwargs (Dict[str, Union[str, List]]): Keyword arguments where keys are
+            component 'id' values in the app's layout, and values are dictionaries
+            representing the component props and corresponding values to be applied.
+
+    Returns:
+        Layout: The updated Dash app layout.
+
+    Example:
+        # Update the component with id 'test1' a new 'children'
+        # prop equal to 'it worked!!!'
+        new_layout = update_component_state(
+            layout=your_layout, updated=None, test1={'children': 'it worked!!!'}
+        )
+    """
+    # Typed loosely above so the mypyc build accepts the same inputs as the source.
+    if not kwargs or not isinstance(layout, (list, dict)):
+        return layout
+
+    patches = {id.replace("-", "_"): patch for id, patch in kwargs.items()}
+    return _update_component_state(layout, patches)
+
+
+def _update_component_state(
+    layout: Layout,
+    patches: dict[str, dict[str, Any]],
+) -> Layout:
+    """
+    Walk the layout and apply `patches`, whose keys are already normalized
+    component ids. Dash ids are unique, so the walk stops once every patch has
+    been applied.
+    """
+    remaining = set(patches)
+    stack: list[Any] = [layout]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            if isinstance(node, list):
+                stack.extend(node)
+            continue
+
+        # A serialized component keeps its id and children in its props, so go
+        # straight to them instead of visiting the props dict separately.
+        props = node.get("props")
+        if isinstance(props, dict):
+            node = props
+
+        # Only containers can hold components, so leave text and numbers behind.
+        children = node.get("children")
+        if isinstance(children, (list, dict)):
+            stack.append(children)
+
+        id = node.get("id")
+        if isinstance(id, str):
+            id = id.replace("-", "_")
+            patch = patches.get(id, _MISSING)
+            if patch is not _MISSING:
+                node.update(patch)
+                remaining.discard(id)
+                if not remaining:
+                    break
+
+    return layout
+
+
+def strip_props(layout: Layout, keys: AbstractSet[str]) -> Layout:
+    """
+    Copy a Dash app layout, leaving `keys` out of every component's props.
+
+    Only the lists and dicts along the way are copied; all other values are
+    shared with `layout`, which is left untouched.
+
+    Args:
+        layout (Layout): The Dash app layout to copy.
+        keys (AbstractSet[str]): The component props to drop, e.g. `{"figure"}`.
+
+    Returns:
+        Layout: The copied layout without the given props.
+    """
+    root: Layout = list(layout) if isinstance(layout, list) else dict(layout)
+    stack: list[Any] = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            for i, item in enumerate(node):
+                if isinstance(item, list):
+                    node[i] = item = list(item)
+                    stack.append(item)
+                elif isinstance(item, dict):
+                    node[i] = item = dict(item)
+                    stack.append(item)
+            continue
+
+        # Reassigning existing keys leaves the dict's size unchanged, so it is
+        # safe while iterating.
+        for key, value in node.items():
+            if isinstance(value, list):
+                node[key] = value = list(value)
+                stack.append(value)
+            elif isinstance(value, dict):
+                if key == "props":
+                    value = {k: v for k, v in value.items() if k not in keys}
+                else:
+                    value = dict(value)
+                node[key] = value
+                stack.append(value)
+
+    return root
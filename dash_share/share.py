@@ -1,100 +1,86 @@
+import gzip
+import inspect
 import json
 import os
+import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
+from functools import lru_cache
 from hashlib import shake_128
-from typing import Any, Callable
+from types import ModuleType
+from typing import Any, Callable, Optional
 from urllib.parse import urlparse, parse_qs
-from pathlib import Path
 
 import dash_bootstrap_components as dbc
 from dash import Dash, dcc, html, no_update
 from dash.dependencies import Input, Output, State, Component
 
+from .modify import Layout, strip_props, update_component_state
+
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 AppLayout = list[dict[str, Any]]
 
+# Directory `FileShare` reads and writes shared states from.
+SHARE_DIR = "./share"
 
-def update_component_state(
-    layout: list[dict[str, Any]] | dict[str, Any],
-    updated: None | list[dict[str, Any]] = None,
-    **kwargs: dict[str, Any],
-) -> list[dict[str, Any]]:
-    """
-    Recursively updates values in a Dash app layout.
 
-    Args:
-        layout (list[dict[str, Any]] | dict[str, Any]): The Dash app layout to be updated.
-        updated (Optional[list[dict[str, Any]]]): A list to store the updated layout.
-            Defaults to None, and a new list will be created.
-        **kwargs (Dict[str, Union[str, List]]): Keyword arguments where keys are
-            component 'id' values in the app's layout, and values are dictionaries
-            representing the component props and corresponding values to be applied.
+@lru_cache(maxsize=None)
+def _url_suffix() -> str:
+    """
+    The path to append to shared urls. Read from the `ON_SERVER` environment
+    variable on first use (so `.env` files loaded at startup still apply) and
+    cached for the life of the process.
+    """
+    return "/dash" if os.getenv("ON_SERVER") else ""
 
-    Returns:
-        list[dict[str, Any]]: The updated Dash app layout.
 
-    Example:
-        # Update the component with id 'test1' a new 'children'
-        # prop equal to 'it worked!!!'
-        new_layout = update_component_state(
-            layout=your_layout, updated=None, test1={'children': 'it worked!!!'}
-        )
+def _dumps(obj: Any, indent: bool = False) -> bytes:
     """
-    if not kwargs:
-        return layout
+    Serialize an object to JSON bytes, using `orjson` when it is installed.
 
-    if updated is None:
-        updated = [] if isinstance(layout, list) else {}
+    Falls back to the stdlib `json` module when `orjson` isn't installed or can't
+    serialize `obj` (e.g. integers wider than 64 bits). The two don't format every
+    value the same way (floats such as `1e16`, non-finite numbers), so a state
+    can hash differently depending on which serializer was used.
 
-    if isinstance(layout, dict):
-        if "children" in layout:
-            layout["children"] = update_component_state(
-                layout["children"], None, **kwargs
-            )
-        if "props" in layout:
-            layout["props"] = update_component_state(layout["props"], None, **kwargs)
-        if "id" in layout:
-            id = layout["id"].replace("-", "_")
-            if id in kwargs:
-                layout.update(kwargs[id])
-
-        return layout
-
-    if isinstance(layout, str) or layout is None:
-        return layout
-
-    for item in layout:
-        props = item["props"]
-        children = props.get("children", None)
-        if children and isinstance(children, dict):
-            if "children" in children.get("props", "") or "props" in children:
-                children["props"] = update_component_state(
-                    children["props"], None, **kwargs
-                )
-            elif "children" in children:
-                children["children"] = update_component_state(
-                    children["children"], None, **kwargs
-                )
-            else:
-                raise ValueError("Not Expected App Structure")
+    Args:
+        obj (Any): The object to serialize.
+        indent (bool): Pretty-print with two space indentation. Defaults to False.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+        except TypeError:
+            pass
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
 
-        if children and isinstance(children, list):
-            props["children"] = update_component_state(children, None, **kwargs)
 
-        id = props.get("id", "")
-        id = id.replace("-", "_")
-        if id not in kwargs:
-            updated.append(item)
-            continue
+# Integers outside the 64-bit range have at least 19 digits. `orjson` silently
+# reads them back as floats, so documents containing such runs use `json`.
+_LONG_DIGITS = re.compile(rb"\d{19}")
 
-        props.update(kwargs[id])
-        item["props"] = props
-        updated.append(item)
 
-    return updated
+def _loads(data: bytes) -> Any:
+    """
+    Deserialize JSON bytes, using `orjson` when it is installed and the document
+    can't contain integers it would lose precision on.
+    """
+    if orjson is not None and _LONG_DIGITS.search(data) is None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
-@dataclass
+@dataclass(slots=True)
 class DashShare(ABC):
     """_summary_
 
@@ -120,7 +106,13 @@ class DashShare(ABC):
             locked after reloading. If there aren't very many callbacks, it can be
             left as the default, but should be longer if callbacks take more than
             two seconds to finish running.
-        locked (bool): Track whether or not the application should be locked.
+        hash_exclude (frozenset[str]): Component props to leave out when hashing the
+            application state, e.g. `{"figure"}` if the saved state drops figures
+            anyway. Two states that only differ in these props get the same hash.
+            Defaults to an empty set.
+        locked (bool): Track whether or not the application should be locked. Not a
+            constructor argument; starts as False and can be set directly or via
+            `lock`/`unlock`.
 
     """
 
@@ -134,10 +126,23 @@ class DashShare(ABC):
     modal_id: str = "save-modal"
     link_id: str = "url-link"
     interval_delay: int = 2000
-    locked: bool = field(init=False)
+    hash_exclude: frozenset[str] = frozenset()
+    _lock_flag: list[bool] = field(init=False, repr=False)
+    _static_components: None | list[Component] = field(init=False, repr=False)
 
     def __post_init__(self):
-        self.locked = False
+        # A one element list so `pause_update` can close over the flag itself.
+        self._lock_flag = [False]
+        self._static_components = None
+
+    @property
+    def locked(self) -> bool:
+        """Whether components tagged with `@pause_update` are currently locked."""
+        return self._lock_flag[0]
+
+    @locked.setter
+    def locked(self, value: bool):
+        self._lock_flag[0] = value
 
     def _make_state_tracker_components(
         self, *args: tuple[Component]
@@ -150,6 +155,14 @@ class DashShare(ABC):
         Returns:
             list[Component]: A new list of components to include in the app's layout.
         """
+        # The sharing components never change, so build them once and reuse them
+        # every time the layout is served.
+        if self._static_components is None:
+            self._static_components = self._build_state_tracker_components()
+        return [*self._static_components, *args]
+
+    def _build_state_tracker_components(self) -> list[Component]:
+        """Build the interval and modal components used to share the app state."""
         return [
             dcc.Interval(
                 id=self.interval_id,
@@ -199,18 +212,17 @@ class DashShare(ABC):
                 centered=True,
                 scrollable=True,
             ),
-            *args,
         ]
 
     def lock(self):
         """Lock components tagged with `@pause_update`."""
         print("locked")
-        self.locked = True
+        self._lock_flag[0] = True
 
     def unlock(self):
         """Unlock components tagged with `@pause_update`."""
         print("unlocked")
-        self.locked = False
+        self._lock_flag[0] = False
 
     def update_layout(self, layout: AppLayout, *args: tuple[Component]) -> html.Div:
         """Update your application's layout to include the sharing components.
@@ -235,22 +247,34 @@ class DashShare(ABC):
         Args:
             func (Callable): The application callback to pause.
         """
+        lock_flag = self._lock_flag
 
         def inner(*args, **kwargs):
-            if self.locked:
+            if lock_flag[0]:
                 return no_update
             return func(*args, **kwargs)
 
         return inner
 
     @abstractmethod
-    def save(self, input: str, state: AppLayout, hash: str):
+    def save(
+        self,
+        input: str,
+        state: AppLayout,
+        hash: str,
+        serialized: bytes | None = None,
+    ):
         """A user-specified method to save out the application state.
 
         Args:
             input (str): The input of the component that triggers the save.
             state (AppLayout): The application state (layout).
             hash (str): The hashed code corresponding to the layout.
+            serialized (bytes, optional): The layout already serialized to JSON
+                bytes, which can be written out directly instead of serializing
+                `state` again. Implementations that leave this argument out of
+                their signature are still called with just `input`, `state` and
+                `hash`.
         """
         pass
 
@@ -267,6 +291,11 @@ class DashShare(ABC):
 
     def register_callbacks(self):
         """Register all the callbacks so they are triggered when the app runs."""
+        save_params = inspect.signature(self.save).parameters
+        # Only hand the serialized state to `save` methods that can take it.
+        pass_serialized = "serialized" in save_params or any(
+            p.kind is inspect.Parameter.VAR_KEYWORD for p in save_params.values()
+        )
 
         @self.app.callback(
             Output(self.interval_id, "disabled", allow_duplicate=True),
@@ -306,9 +335,19 @@ class DashShare(ABC):
         )
         @self.pause_update
         def save(input, state, is_open, url):
-            hashed_url = self.encode(state)
+            # Only serialize the full state if it is hashed or handed to `save`.
+            serialized = None
+            if pass_serialized or not self.hash_exclude:
+                serialized = _dumps(state)
+            if self.hash_exclude:
+                hashed_url = self.encode(strip_props(state, self.hash_exclude))
+            else:
+                hashed_url = self.encode(state, serialized=serialized)
             # Use user-defined save method.
-            output = self.save(input, state, hash=hashed_url)
+            if pass_serialized:
+                output = self.save(input, state, hash=hashed_url, serialized=serialized)
+            else:
+                output = self.save(input, state, hash=hashed_url)
             if input:
                 return (
                     output,
@@ -327,18 +366,22 @@ class DashShare(ABC):
             return self.load(input, state)
 
     @staticmethod
-    def encode(state: AppLayout, n: int = 8) -> str:
+    def encode(state: AppLayout, n: int = 8, serialized: bytes | None = None) -> str:
         """Use the `shake_128` algorighm to hash the application layout.
 
         Args:
             state (AppLayout): The app layout to encode.
             n (int, optional): The number of characters you want the hash to be.
                 Defaults to 4.
+            serialized (bytes, optional): `state` already serialized to JSON. If
+                given it is hashed directly instead of serializing `state` again.
 
         Returns:
             str: The hash of the application layout.
         """
-        return shake_128(json.dumps(state).encode("utf-8")).hexdigest(int(n / 2))
+        if serialized is None:
+            serialized = _dumps(state)
+        return shake_128(serialized).hexdigest(int(n / 2))
 
     @staticmethod
     def get_url_base(url: str) -> str:
@@ -350,11 +393,8 @@ class DashShare(ABC):
         Returns:
             str: The base url.
         """
-        on_server = os.getenv("ON_SERVER")
-
         parsed_url = urlparse(url)
-        end = "" if on_server is None or not on_server else "/dash"
-        return f"{parsed_url.scheme}://{parsed_url.netloc}{end}"
+        return f"{parsed_url.scheme}://{parsed_url.netloc}{_url_suffix()}"
 
     @staticmethod
     def parse_query_string(qs: str) -> dict[str, str]:
@@ -367,65 +407,98 @@ class DashShare(ABC):
             dict[str, str]: A dict of key, value pairs from the query string.
         """
         qs = qs.replace("?", "")
+        # Fast path for the `?state=<hash>` urls built by `register_callbacks`.
+        if qs.startswith("state="):
+            value = qs[6:]
+            if value.isalnum():
+                return {"state": value}
+
         parsed_data = parse_qs(qs)
         result_dict = {key: value[0] for key, value in parsed_data.items()}
         return result_dict
 
 
+@dataclass(slots=True)
 class FileShare(DashShare):
     """Share application state by saving a .json file to disk on the host machine.
 
     Args:
         update_components (list[dict[str, Any]]): Dict of component ids and props
             to update before the state is saved.
+        compress (bool): Gzip the saved .json files. If False, states are written
+            as indented plain .json files instead. Uncompressed files saved
+            previously can still be loaded. Defaults to True.
     """
 
     update_components: None | dict[str, Any] = None
+    compress: bool = True
 
-    def load(self, input: str, state: AppLayout) -> AppLayout:
+    def load(self, input: str, state: Layout) -> Layout:
         """Load the application state from a file.
 
         Args:
             input (str): The url with state information
-            state (AppLayout): The current application state to use if the share fails.
+            state (Layout): The current application state to use if the share fails.
 
         Returns:
-            AppLayout: The updated layout.
+            Layout: The updated layout.
         """
         q = self.parse_query_string(input)
         if "state" in q:
+            path = f'{SHARE_DIR}/{q["state"]}.json'
             try:
-                with open(f'./share/{q["state"]}.json', "rb") as file:
-                    state = json.load(file)
+                with gzip.open(f"{path}.gz", "rb") as file:
+                    data = file.read()
             except FileNotFoundError:
-                return state
+                try:
+                    with open(path, "rb") as file:
+                        data = file.read()
+                except FileNotFoundError:
+                    return state
+            state = _loads(data)
             state = update_component_state(
                 state, None, **{self.modal_id: {"is_open": False}}
             )
         return state
 
-    def save(self, input: str, state: AppLayout, hash: str) -> str:
+    def save(
+        self,
+        input: str,
+        state: Layout,
+        hash: str,
+        serialized: bytes | None = None,
+    ) -> str:
         """The function that saves the app state when the input callback is triggered.
 
         Args:
             input (str): The input value that triggered the save callback.
-            state (AppLayout): The application state to be saved.
+            state (Layout): The application state to be saved.
             hash (str): The hash that encodes the state.
+            serialized (bytes, optional): `state` already serialized to JSON. Written
+                as is to compressed files when no `update_components` need to be
+                applied.
 
         Returns:
             str: _description_
         """
-        out_dir = Path("./share")
-        if not out_dir.exists():
-            out_dir.mkdir()
-
-        if Path(f"./{out_dir}/{hash}.json").exists():
+        os.makedirs(SHARE_DIR, exist_ok=True)
+        path = f"{SHARE_DIR}/{hash}.json"
+        # States are keyed by their hash, so an existing file already holds them.
+        if os.path.exists(f"{path}.gz") or os.path.exists(path):
             return input
         if input is not None and input > 0:
             if self.update_components:
                 print(self.update_components)
                 state = update_component_state(state, None, **self.update_components)
+                serialized = None
 
-            with open(f"./{out_dir}/{hash}.json", "w") as json_file:
-                json.dump(state, json_file, indent=4)
+            if self.compress:
+                if serialized is None:
+                    serialized = _dumps(state)
+                with gzip.open(f"{path}.gz", "wb", compresslevel=1) as json_file:
+                    json_file.write(serialized)
+            else:
+                # Uncompressed files are meant to be read, so always indent them.
+                with open(path, "wb") as json_file:
+                    json_file.write(_dumps(state, indent=True))
         return input
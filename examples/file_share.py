@@ -6,7 +6,6 @@ import plotly.express as px
 import pandas as pd
 from pathlib import Path
 
-from urllib.parse import parse_qs
 import json
 
 df = pd.read_csv('https://raw.githubusercontent.com/plotly/datasets/master/gapminder_unfiltered.csv')
@@ -49,16 +48,9 @@ layout = dbc.Container(
     },
         )
 
-def parse_query_string(query_string):
-    query_string = query_string.replace("?", "")
-    parsed_data = parse_qs(query_string)
-    result_dict = {key: value[0] for key, value in parsed_data.items()}
-    return result_dict
-
-
 class FileShare2(DashShare):
     def load(self, input, state):
-        q = parse_query_string(input)
+        q = self.parse_query_string(input)
         if "state" in q:
             with open(f'./share/{q["state"]}.json', "rb") as file:
                 state = json.load(file)
@@ -89,6 +81,8 @@ share = FileShare2(
     save_input=("share", "n_clicks"),
     save_output=("share", "n_clicks"),
     url_input="url",
+    # Figures are cleared before saving, so don't let them change the hash.
+    hash_exclude=frozenset({"figure"}),
 )
 
 app.layout = lambda: share.update_layout(layout=layout)
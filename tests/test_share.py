@@ -1,5 +1,18 @@
+import gzip
 import json
-from dash_share.share import update_component_state
+import os
+import sys
+
+from dash import no_update
+
+from dash_share.modify import strip_props
+from dash_share.share import (
+    DashShare,
+    FileShare,
+    _dumps,
+    _loads,
+    update_component_state,
+)
 
 
 def test_update_state():
@@ -11,3 +24,280 @@ def test_update_state():
     )
 
     assert new_layout[3]["props"]["children"][0]["props"]["children"] == "it worked!!!"
+
+
+def test_update_state_deeply_nested():
+    layout = {"props": {"id": "leaf", "children": "old"}, "type": "Div"}
+    for _ in range(sys.getrecursionlimit() + 100):
+        layout = {"props": {"children": [layout]}, "type": "Div"}
+
+    update_component_state([layout], None, leaf={"children": "new"})
+
+    node = layout
+    while "id" not in node["props"]:
+        node = node["props"]["children"][0]
+    assert node["props"]["children"] == "new"
+
+
+def test_update_state_hyphenated_id():
+    layout = [{"props": {"id": "save-modal", "is_open": True}, "type": "Modal"}]
+
+    new_layout = update_component_state(
+        layout, None, **{"save-modal": {"is_open": False}}
+    )
+
+    assert new_layout[0]["props"]["is_open"] is False
+
+
+def test_update_state_multiple_ids():
+    with open("./tests/test.json", "r") as file:
+        layout = json.load(file)
+
+    new_layout = update_component_state(
+        layout, None, update={"children": "a"}, load={"children": "b"}
+    )
+
+    assert new_layout[0]["props"]["children"] == "a"
+    assert new_layout[2]["props"]["children"] == "b"
+
+
+def test_update_state_multiple_hyphenated_ids():
+    layout = [
+        {"props": {"id": "save-modal", "is_open": True}},
+        {"props": {"id": "url_link", "value": ""}},
+    ]
+
+    update_component_state(
+        layout,
+        None,
+        **{"save-modal": {"is_open": False}, "url-link": {"value": "x"}},
+    )
+
+    assert layout[0]["props"]["is_open"] is False
+    assert layout[1]["props"]["value"] == "x"
+
+
+def test_update_state_skips_pattern_matching_ids():
+    layout = [
+        {"props": {"id": {"type": "test", "index": 0}, "value": 0}},
+        {"props": {"id": "test", "value": 0}},
+        {"props": {"id": "other", "value": 0}},
+    ]
+
+    update_component_state(layout, None, test={"value": 1}, other={"value": 2})
+
+    assert [item["props"]["value"] for item in layout] == [0, 1, 2]
+
+
+def test_update_state_stops_after_last_patch():
+    class Unvisited(dict):
+        def get(self, *args):
+            raise AssertionError("walked past the last patch")
+
+    # The layout is walked last to first, so the first item is never reached.
+    layout = [
+        Unvisited(),
+        {"props": {"id": "a", "children": [{"props": {"id": "b"}}]}},
+    ]
+
+    update_component_state(layout, None, a={"value": 1}, b={"value": 2})
+
+    assert layout[1]["props"]["value"] == 1
+    assert layout[1]["props"]["children"][0]["props"]["value"] == 2
+
+
+def test_update_state_non_layout_unchanged():
+    assert update_component_state(None, None, test={"value": 1}) is None
+    assert update_component_state("text", None, test={"value": 1}) == "text"
+
+
+def test_parse_query_string():
+    assert DashShare.parse_query_string("?state=1a2b3c4d") == {"state": "1a2b3c4d"}
+    assert DashShare.parse_query_string("?state=a%20b&x=1") == {
+        "state": "a b",
+        "x": "1",
+    }
+    assert DashShare.parse_query_string("?state=") == {}
+
+
+def test_strip_props():
+    with open("./tests/test.json", "r") as file:
+        layout = json.load(file)
+    before = json.dumps(layout)
+
+    stripped = strip_props(layout, {"n_clicks", "n_clicks_timestamp"})
+
+    assert json.dumps(layout) == before
+    assert "n_clicks" not in stripped[0]["props"]
+    assert stripped[0]["props"]["id"] == "update"
+
+
+def test_wide_integers_round_trip():
+    values = [2**70 + 1, -(2**64) - 1, 1.5]
+    data = _dumps(values)
+
+    assert data == b"[1180591620717411303425,-18446744073709551617,1.5]"
+    loaded = _loads(data)
+    assert loaded == values
+    assert [type(value) for value in loaded] == [int, int, float]
+    assert _loads(b'[1, "x"]') == [1, "x"]
+
+
+class CallbackApp:
+    """Stand-in for `Dash` that records registered callbacks in order."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def callback(self, *args, **kwargs):
+        def decorator(func):
+            self.callbacks.append(func)
+            return func
+
+        return decorator
+
+
+def make_share(share_cls, **kwargs):
+    app = CallbackApp()
+    share = share_cls(
+        app=app,
+        load_input=("url", "search"),
+        save_input=("share", "n_clicks"),
+        save_output=("share", "n_clicks"),
+        url_input="url",
+        **kwargs,
+    )
+    share.register_callbacks()
+    # `enable_interval_and_lock`, `unlock_after_interval_trigger`, `save`, `load`
+    return share, app.callbacks[2], app.callbacks[3]
+
+
+class ThreeArgShare(DashShare):
+    """A share whose `save` predates the `serialized` argument."""
+
+    def load(self, input, state):
+        return state
+
+    def save(self, input, state, hash):
+        self.calls = (input, state, hash)
+        return input
+
+
+def test_save_without_serialized_argument():
+    share, save, _ = make_share(ThreeArgShare)
+    layout = [{"props": {"id": "test"}}]
+
+    output, is_open, link = save(1, layout, False, "http://host/page")
+
+    assert share.calls == (1, layout, DashShare.encode(layout))
+    assert output == 1 and is_open is True
+    assert link == f"http://host/?state={DashShare.encode(layout)}"
+
+
+def test_save_with_var_keyword_arguments():
+    class KwargsShare(DashShare):
+        def load(self, input, state):
+            return state
+
+        def save(self, input, state, hash, **kwargs):
+            self.calls = kwargs
+            return input
+
+    share, save, _ = make_share(KwargsShare)
+    layout = [{"props": {"id": "test"}}]
+
+    save(1, layout, False, "http://host/page")
+
+    assert share.calls == {"serialized": _dumps(layout)}
+
+
+def make_file_share(**kwargs):
+    share, _, _ = make_share(FileShare, **kwargs)
+    return share
+
+
+def test_file_share_gzip_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    share = make_file_share()
+    layout = [{"props": {"id": "save-modal", "is_open": True}}]
+
+    share.save(1, layout, hash="abcd", serialized=_dumps(layout))
+
+    assert os.listdir("share") == ["abcd.json.gz"]
+    with gzip.open("share/abcd.json.gz", "rb") as file:
+        assert json.loads(file.read()) == layout
+    loaded = share.load("?state=abcd", None)
+    assert loaded == [{"props": {"id": "save-modal", "is_open": False}}]
+
+
+def test_file_share_loads_uncompressed_json(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    share = make_file_share()
+    os.mkdir("share")
+    with open("share/abcd.json", "w") as file:
+        json.dump([{"props": {"id": "test", "children": "old"}}], file)
+
+    assert share.load("?state=abcd", None) == [
+        {"props": {"id": "test", "children": "old"}}
+    ]
+    assert share.load("?state=missing", "fallback") == "fallback"
+
+
+def test_file_share_skips_existing_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    share = make_file_share()
+    os.mkdir("share")
+    for name in ("gz.json.gz", "plain.json"):
+        with open(f"share/{name}", "wb") as file:
+            file.write(b"existing")
+
+    assert share.save(1, [{"props": {"id": "new"}}], hash="gz") == 1
+    assert share.save(1, [{"props": {"id": "new"}}], hash="plain") == 1
+
+    assert sorted(os.listdir("share")) == ["gz.json.gz", "plain.json"]
+    for name in ("gz.json.gz", "plain.json"):
+        with open(f"share/{name}", "rb") as file:
+            assert file.read() == b"existing"
+
+
+def test_file_share_uncompressed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    share = make_file_share(compress=False)
+    layout = [{"props": {"id": "test", "children": "content"}}]
+
+    share.save(1, layout, hash="abcd", serialized=_dumps(layout))
+
+    assert os.listdir("share") == ["abcd.json"]
+    with open("share/abcd.json", "rb") as file:
+        assert file.read() == _dumps(layout, indent=True)
+    assert share.load("?state=abcd", None) == layout
+
+
+def test_save_with_hash_exclude(monkeypatch):
+    share, save, _ = make_share(ThreeArgShare, hash_exclude=frozenset({"figure"}))
+    layout = [{"props": {"id": "graph", "figure": {"data": [1, 2, 3]}}}]
+    dumped = []
+
+    def recording_dumps(obj, indent=False):
+        dumped.append(obj)
+        return _dumps(obj, indent)
+
+    monkeypatch.setattr("dash_share.share._dumps", recording_dumps)
+    save(1, layout, False, "http://host/page")
+
+    # Only the stripped layout is serialized, once, and the layout is untouched.
+    assert dumped == [[{"props": {"id": "graph"}}]]
+    assert share.calls[2] == DashShare.encode([{"props": {"id": "graph"}}])
+    assert layout[0]["props"]["figure"] == {"data": [1, 2, 3]}
+
+
+def test_locked_pauses_callbacks():
+    share, _, _ = make_share(ThreeArgShare)
+    callback = share.pause_update(lambda value: value)
+
+    share.locked = True
+    assert share.locked is True
+    assert callback(1) is no_update
+
+    share.locked = False
+    assert callback(1) == 1